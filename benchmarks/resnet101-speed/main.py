@@ -1,9 +1,9 @@
 """ResNet-101 Speed Benchmark"""
+from contextlib import nullcontext
 import os
 import platform
-from tabnanny import check
 import time
-from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple, cast
 
 import click
 import torch
@@ -12,6 +12,7 @@ import torch.nn.functional as F
 from torch.optim import SGD
 
 import torch.distributed as dist
+from torch.distributed.algorithms.ddp_comm_hooks import default_hooks
 import torch.multiprocessing as mp
 from torch.nn.parallel import DistributedDataParallel as DDP
 
@@ -73,6 +74,15 @@ class Experiments:
         return model, batch_size, list(model.devices)
 
 
+CommHook = Callable[[Any, dist.GradBucket], torch.futures.Future]
+
+COMPRESS_HOOKS: Dict[str, Optional[CommHook]] = {
+    'none': None,
+    'bf16': default_hooks.bf16_compress_hook,
+    'fp16': default_hooks.fp16_compress_hook,
+}
+
+
 EXPERIMENTS: Dict[str, Experiment] = {
     'baseline': Experiments.baseline,
     'pipeline-1': Experiments.pipeline1,
@@ -82,55 +92,97 @@ EXPERIMENTS: Dict[str, Experiment] = {
 }
 
 
-BASE_TIME: float = 0
+# Monotonic anchor in nanoseconds for elapsed time in log().
+BASE_TIME: int = 0
+
+# The terminal width is queried once rather than on every log line.
+TERM_WIDTH, _ = click.get_terminal_size()
 
 
 def hr() -> None:
     """Prints a horizontal line."""
-    width, _ = click.get_terminal_size()
-    click.echo('-' * width)
+    click.echo('-' * TERM_WIDTH)
 
 
 def log(msg: str, clear: bool = False, nl: bool = True) -> None:
     """Prints a message with elapsed time."""
     if clear:
-        # Clear the output line to overwrite.
-        width, _ = click.get_terminal_size()
-        click.echo('\b\r', nl=False)
-        click.echo(' ' * width, nl=False)
-        click.echo('\b\r', nl=False)
-
-    t = time.time() - BASE_TIME
-    h = t // 3600
-    t %= 3600
-    m = t // 60
-    t %= 60
-    s = t
+        # Clear the output line to overwrite in a single write.
+        click.echo('\r\x1b[2K', nl=False)
+
+    t = (time.perf_counter_ns() - BASE_TIME) // 10**9
+    h, t = divmod(t, 3600)
+    m, s = divmod(t, 60)
 
     click.echo('%02d:%02d:%02d | ' % (h, m, s), nl=False)
     click.echo(msg, nl=nl)
 
 
+def autocast_partitions(model: nn.Module) -> None:
+    """Runs every partition under BF16 autocast.
+
+    Autocast state is thread-local but GPipe runs partitions in its worker
+    threads. Hence autocast is entered around each partition by hooks rather
+    than around the whole model. BF16 has the range of FP32, so no gradient
+    scaling is required.
+    """
+    def register_hooks(partition: nn.Module) -> None:
+        contexts: List[torch.autocast] = []
+
+        def enter_autocast(module: nn.Module, input: Any) -> None:
+            context = torch.autocast('cuda', dtype=torch.bfloat16)
+            context.__enter__()
+            contexts.append(context)
+
+        def exit_autocast(module: nn.Module, input: Any, output: Any) -> None:
+            contexts.pop().__exit__(None, None, None)
+
+        partition.register_forward_pre_hook(enter_autocast)
+        partition.register_forward_hook(exit_autocast)
+
+    partitions = model.partitions if isinstance(model, GPipe) else [model]
+    for partition in partitions:
+        register_hooks(partition)
+
+
+def nvtx_range(msg: str, enabled: bool) -> ContextManager[None]:
+    """Marks a range for Nsight Systems only if profiling is enabled."""
+    if enabled:
+        return torch.cuda.nvtx.range(msg)
+    return nullcontext()
+
+
 def parse_devices(ctx: Any, param: Any, value: Optional[str]) -> List[int]:
     if value is None:
         return list(range(torch.cuda.device_count()))
     return [int(x) for x in value.split(',')]
 
 
-def data_parallel_train(rank, world_size, experiment, devices, epochs):
+def data_parallel_train(rank, world_size, experiment, devices, epochs, accum_steps,
+                        amp, use_compile, compress, profile):
     """Train ResNet-101 with data parallelism"""
-    # initialize environment
-    os.environ['MASTER_ADDR'] = 'localhost'
-    os.environ['MASTER_PORT'] = '12355'
+    # initialize environment (torchrun sets these already)
+    os.environ.setdefault('MASTER_ADDR', 'localhost')
+    os.environ.setdefault('MASTER_PORT', '12355')
     dist.init_process_group('nccl', rank=rank, world_size=world_size)
 
     model: nn.Module = resnet101(num_classes=1000)
 
-    if len(devices) % world_size != 0:
-        raise ValueError('GPUs cannot be divided evenly into %d pipelines' % (world_size))
-    num_devices_per_pipeline = len(devices) // world_size
+    # cuDNN prefers NHWC for convolutions. Convert the parameters before
+    # partitioning so that every partition keeps the layout.
+    model = model.to(memory_format=torch.channels_last)
+
+    # The devices are divided among the ranks on this node. torchrun sets the
+    # local rank and size. Under mp.spawn, all ranks are on this node.
+    local_rank = int(os.environ.get('LOCAL_RANK', rank))
+    local_world_size = int(os.environ.get('LOCAL_WORLD_SIZE', world_size))
+
+    if len(devices) % local_world_size != 0:
+        raise ValueError('GPUs cannot be divided evenly into %d pipelines' % (local_world_size))
+    num_devices_per_pipeline = len(devices) // local_world_size
     # Get the set of GPUs to be used for this pipeline
-    devices_pipeline = devices[rank * num_devices_per_pipeline: (rank+1) * num_devices_per_pipeline]
+    devices_pipeline = devices[local_rank * num_devices_per_pipeline:
+                               (local_rank+1) * num_devices_per_pipeline]
 
     # Pipeline parallelism
     f = EXPERIMENTS[experiment]
@@ -141,28 +193,69 @@ def data_parallel_train(rank, world_size, experiment, devices, epochs):
         #   ValueError: too few devices to hold given partitions (devices: 1, paritions: 2)
         raise exc
 
-    # Data parallelism
-    model = DDP(model)
-
-    optimizer = SGD(model.parameters(), lr=0.1)
+    if amp:
+        autocast_partitions(model)
+
+    # Only the baseline is compiled. GPipe splits micro-batches and runs
+    # partitions in worker threads, which graph capture cannot follow.
+    if use_compile:
+        model = torch.compile(model, mode='max-autotune')
+
+    # Data parallelism. A GPipe model spans multiple devices, hence
+    # device_ids=None. Gradients are exposed as views of the communication
+    # buckets to avoid copying them on every step. The graph is declared
+    # static only without accumulation, when every step synchronizes.
+    model = DDP(model,
+                device_ids=None,
+                gradient_as_bucket_view=True,
+                # A static graph is recorded by the first backward, which
+                # must not run under no_sync(). Otherwise, DDP fails an
+                # internal assertion in its reducer.
+                static_graph=(accum_steps == 1),
+                bucket_cap_mb=50)
+
+    # Gradients may be compressed for AllReduce to halve the bytes on the wire.
+    compress_hook = COMPRESS_HOOKS[compress]
+    if compress_hook is not None:
+        model.register_comm_hook(state=None, hook=compress_hook)
+
+    # ResNet-101 has hundreds of small parameters. The multi-tensor SGD updates
+    # them by a few grouped kernels instead of a few kernels per parameter.
+    optimizer = SGD(model.parameters(), lr=0.1, foreach=True)
 
     in_device = _devices[0]
     out_device = _devices[-1]
     torch.cuda.set_device(in_device)
 
+    # Input shapes are fixed, so let cuDNN pick the fastest algorithms once.
+    # TF32 is used for convolutions and matmuls on Ampere or newer GPUs.
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
     # This experiment cares about only training speed, rather than accuracy.
-    # To eliminate any overhead due to data loading, we use fake random 224x224
-    # images over 1000 labels.
+    # To eliminate any overhead due to data loading, we use fake 224x224 images
+    # over 1000 random labels. The pixel values do not matter for speed, so the
+    # images are just zeros rather than a random fill. They are laid out in
+    # NHWC to match the channels_last model without any conversion.
     dataset_size = 50000
 
-    input = torch.rand(batch_size, 3, 224, 224, device=in_device)
+    input = torch.empty(batch_size, 3, 224, 224, device=in_device,
+                        memory_format=torch.channels_last).zero_()
     target = torch.randint(1000, (batch_size,), device=out_device)
-    data = [(input, target)] * (dataset_size//batch_size)
 
-    if dataset_size % batch_size != 0:
-        last_input = input[:dataset_size % batch_size]
-        last_target = target[:dataset_size % batch_size]
-        data.append((last_input, last_target))
+    # Every step feeds the same fake mini-batch. Only the last step of an
+    # epoch feeds a smaller one if the dataset is not divisible by the batch.
+    steps_per_epoch = (dataset_size + batch_size - 1) // batch_size
+    last_step = steps_per_epoch - 1
+    last_batch_size = dataset_size - last_step*batch_size
+    last_input = input.narrow(0, 0, last_batch_size)
+    last_target = target.narrow(0, 0, last_batch_size)
+
+    # The last accumulation group of an epoch may be shorter than accum_steps.
+    # Its losses are averaged over its actual size.
+    last_group_size = steps_per_epoch % accum_steps or accum_steps
+    last_group_start = steps_per_epoch - last_group_size
 
     # HEADER ======================================================================================
 
@@ -189,7 +282,7 @@ def data_parallel_train(rank, world_size, experiment, devices, epochs):
 
     if rank == 0:
         global BASE_TIME
-        BASE_TIME = time.time()
+        BASE_TIME = time.perf_counter_ns()
 
         throughputs = []
         elapsed_times = []
@@ -197,36 +290,60 @@ def data_parallel_train(rank, world_size, experiment, devices, epochs):
         hr()
 
     for epoch in range(epochs):
-        torch.cuda.synchronize(in_device)
-
         if rank == 0:
-            tick = time.time()
-
-        data_trained = 0
-        for i, (input, target) in enumerate(data):
-            data_trained += input.size(0)
-
-            output = model(input)
-            loss = F.cross_entropy(output, target)
-            loss.backward()
-
-            optimizer.step()
-            optimizer.zero_grad()
-
-            if rank == 0:
+            # An epoch is timed by CUDA events on every device of the pipeline.
+            # The last kernel of a step may run on any of them since backward
+            # flows from the last partition to the first one.
+            start_events = [torch.cuda.Event(enable_timing=True) for _ in _devices]
+            end_events = [torch.cuda.Event(enable_timing=True) for _ in _devices]
+            for device, event in zip(_devices, start_events):
+                event.record(torch.cuda.current_stream(device))
+
+            tick_ns = time.perf_counter_ns()
+
+        for i in range(steps_per_epoch):
+            if i == last_step:
+                step_input, step_target = last_input, last_target
+            else:
+                step_input, step_target = input, target
+
+            # Gradients are accumulated over accum_steps mini-batches. DDP
+            # all-reduces them only at the step which updates the parameters.
+            sync = (i+1) % accum_steps == 0 or i == last_step
+            group_size = last_group_size if i >= last_group_start else accum_steps
+
+            with nullcontext() if sync else model.no_sync():
+                with nvtx_range('forward', profile):
+                    output = model(step_input)
+                    loss = F.cross_entropy(output.float(), step_target) / group_size
+                with nvtx_range('backward', profile):
+                    loss.backward()
+
+            if sync:
+                with nvtx_range('optimizer', profile):
+                    optimizer.step()
+                    # Releasing gradients instead of zero-filling them saves a
+                    # memset per step. The next backward writes them afresh.
+                    optimizer.zero_grad(set_to_none=True)
+
+            # Logging on every step would stall kernel launches on the CPU.
+            if rank == 0 and (i & 15) == 0:
                 # 00:01:02 | 1/20 epoch (42%) | 200.000 samples/sec (estimated)
-                percent = (i+1) / len(data) * 100
-                throughput = data_trained / (time.time()-tick)
+                data_trained = min((i+1) * batch_size, dataset_size)
+                percent = (i+1) / steps_per_epoch * 100
+                throughput = data_trained / ((time.perf_counter_ns()-tick_ns) * 1e-9)
                 log('%d/%d epoch (%d%%) | %.3f samples/sec (estimated)'
                     '' % (epoch+1, epochs, percent, throughput), clear=True, nl=False)
 
-        torch.cuda.synchronize(in_device)
-
         if rank == 0:
-            tock = time.time()
-            
+            for device, event in zip(_devices, end_events):
+                event.record(torch.cuda.current_stream(device))
+            for event in end_events:
+                event.synchronize()
+
             # 00:02:03 | 1/20 epoch | 200.000 samples/sec, 123.456 sec/epoch
-            elapsed_time = tock - tick
+            elapsed_time = max(start.elapsed_time(end)
+                               for start, end in zip(start_events, end_events)) / 1000
             throughput = dataset_size / elapsed_time
             log('%d/%d epoch | %.3f samples/sec, %.3f sec/epoch'
                 '' % (epoch+1, epochs, throughput, elapsed_time), clear=True)
@@ -256,7 +373,7 @@ def data_parallel_train(rank, world_size, experiment, devices, epochs):
     '--dp_world_size', '-dp',
     type=int,
     default=1,
-    help='World size of data parallelism (default: 1)',
+    help='World size of data parallelism, ignored under torchrun (default: 1)',
 )
 @click.option(
     '--epochs', '-e',
@@ -264,6 +381,34 @@ def data_parallel_train(rank, world_size, experiment, devices, epochs):
     default=10,
     help='Number of epochs (default: 10)',
 )
+@click.option(
+    '--accum-steps', '-a',
+    type=int,
+    default=1,
+    help='Number of mini-batches to accumulate gradients over (default: 1)',
+)
+@click.option(
+    '--amp/--no-amp',
+    default=False,
+    help='Enable BF16 automatic mixed precision (default: disabled)',
+)
+@click.option(
+    '--compile/--no-compile', 'use_compile',
+    default=False,
+    help='Compile the baseline model by torch.compile (default: disabled)',
+)
+@click.option(
+    '--compress',
+    type=click.Choice(sorted(COMPRESS_HOOKS.keys())),
+    default='none',
+    help='Compression of gradients for AllReduce (default: none)',
+)
+@click.option(
+    '--profile/--no-profile',
+    default=False,
+    help='Mark forward, backward and optimizer ranges by NVTX for Nsight Systems '
+         '(default: disabled)',
+)
 @click.option(
     '--devices', '-d',
     metavar='0,1,2,3',
@@ -274,11 +419,32 @@ def cli(ctx: click.Context,
         experiment: str,
         dp_world_size: int,
         epochs: int,
+        accum_steps: int,
+        amp: bool,
+        use_compile: bool,
+        compress: str,
+        profile: bool,
         devices: List[int],
         ) -> None:
     """ResNet-101 Speed Benchmark"""
-    mp.spawn(data_parallel_train, args=(dp_world_size, experiment, devices, epochs), 
-            nprocs=dp_world_size, join=True)
+    if accum_steps < 1:
+        ctx.fail('--accum-steps=%d must be positive' % accum_steps)
+    if use_compile and experiment != 'baseline':
+        ctx.fail('--compile is only supported by the baseline experiment')
+
+    args = (experiment, devices, epochs, accum_steps, amp, use_compile, compress, profile)
+
+    # Under torchrun, this process is already one of the data-parallel ranks.
+    # Otherwise, spawn the ranks here.
+    if 'RANK' in os.environ:
+        rank = int(os.environ['RANK'])
+        world_size = int(os.environ['WORLD_SIZE'])
+        data_parallel_train(rank, world_size, *args)
+        return
+
+    mp.spawn(data_parallel_train,
+             args=(dp_world_size, *args),
+             nprocs=dp_world_size, join=True)
 
 
 if __name__ == '__main__':
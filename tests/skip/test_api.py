@@ -34,3 +34,21 @@ def test_skippable_repr():
   (conv): Conv2d(1, 1, kernel_size=(1, 1), stride=(1, 1))
 ))
 '''.strip()
+
+
+def test_isolate_after_stashable():
+    @skippable(stash=['foo'], pop=['bar'])
+    class StashPop(nn.Module):
+        def forward(self, x):
+            yield stash('foo', x)
+            return x
+
+    ns = Namespace()
+    m = StashPop()
+
+    assert list(m.stashable()) == [(None, 'foo')]
+    assert list(m.poppable()) == [(None, 'bar')]
+
+    m.isolate(ns, only=['foo'])
+    assert list(m.stashable()) == [(ns, 'foo')]
+    assert list(m.poppable()) == [(None, 'bar')]
@@ -128,3 +128,21 @@ def test_stash_none():
 
     l1 = Stash()
     l1(torch.tensor(42))
+
+
+def test_no_skips(skip_tracker):
+    @skippable()
+    class Plain(nn.Module):
+        def forward(self, input):
+            return input * 2
+
+    @skippable()
+    class NoYield(nn.Module):
+        def forward(self, input):
+            if False:
+                yield
+            return input * 3
+
+    assert Plain()(torch.tensor(42)).item() == 84
+    assert NoYield()(torch.tensor(42)).item() == 126
+    assert len(skip_tracker.tensors) == 0
@@ -40,6 +40,12 @@ class Skippable(nn.Module):
         self.module = self.module_cls(*args, **kwargs)  # type: ignore
         self.namespaces: Dict[str, Namespace] = {}
 
+        # Namespaced skip names are reused by every forward. They are rebuilt
+        # only when isolate() changes the namespaces.
+        self._stashable: List[Tuple[Namespace, str]] = []
+        self._poppable: List[Tuple[Namespace, str]] = []
+        self._update_namespaced()
+
     def __repr__(self) -> str:
         return f'@skippable({self.module})'
 
@@ -49,15 +55,17 @@ class Skippable(nn.Module):
         ns = cast(Namespace, ns)
         return (ns, name)
 
+    def _update_namespaced(self) -> None:
+        self._stashable = [self.namespaced(name) for name in self.stashable_names]
+        self._poppable = [self.namespaced(name) for name in self.poppable_names]
+
     def stashable(self) -> Iterable[Tuple[Namespace, str]]:
         """Iterates over namespaced skip names to be stashed."""
-        for name in self.stashable_names:
-            yield self.namespaced(name)
+        return self._stashable
 
     def poppable(self) -> Iterable[Tuple[Namespace, str]]:
         """Iterates over namespaced skip names to be popped."""
-        for name in self.poppable_names:
-            yield self.namespaced(name)
+        return self._poppable
 
     def isolate(self: T, ns: Namespace, *, only: Optional[Iterable[str]] = None) -> T:
         r"""Isolates a specified subset or the whole set of skip tensors into a
@@ -115,6 +123,8 @@ class Skippable(nn.Module):
         for name in names:
             self.namespaces[name] = ns
 
+        self._update_namespaced()
+
         return self
 
     def dispatch(self,
@@ -132,16 +142,28 @@ class Skippable(nn.Module):
             output = generator
             return output
 
+        return self._drive(generator, handle_stash, handle_pop)
+
+    @staticmethod
+    def _drive(generator: StashPopGenerator,
+               handle_stash: Callable[[str, Optional[Tensor]], None],
+               handle_pop: Callable[[str], Optional[Tensor]],
+               ) -> TensorOrTensors:
+        """Handles :class:`stash` or :class:`pop` commands until the
+        generator returns the output.
+        """
+        # Commands are matched by exact type rather than isinstance() since
+        # they are resolved for every micro-batch.
         try:
             op = next(generator)
 
             while True:
-                if isinstance(op, stash):
+                if type(op) is stash:
                     handle_stash(op.name, op.tensor)
                     op = next(generator)
                     continue
 
-                if isinstance(op, pop):
+                if type(op) is pop:
                     tensor = handle_pop(op.name)
                     op = generator.send(tensor)
                     continue
@@ -165,32 +187,35 @@ class Skippable(nn.Module):
         skip_tracker = current_skip_tracker()
         stashed_tensors: Dict[str, Optional[Tensor]] = {}
 
-        # Load skip tensors that might be popped.
+        # Load skip tensors that might be popped. The input is wrapped by a
+        # batch only if the skip tracker has to update it.
         poppable_tensors = {}
-        batch = Batch(input)
-        for ns, name in self.poppable():
-            try:
-                poppable_tensors[name] = skip_tracker.load(batch, ns, name)
-            except KeyError:
-                raise RuntimeError(f"'{name}' has not been stashed")
-        input = batch.tensor_or_tensors
+        if self.poppable_names:
+            batch = Batch(input)
+            for ns, name in self.poppable():
+                try:
+                    poppable_tensors[name] = skip_tracker.load(batch, ns, name)
+                except KeyError:
+                    raise RuntimeError(f"'{name}' has not been stashed")
+            input = batch.tensor_or_tensors
 
         # Handle skip commands.
         def handle_stash(name: str, tensor: Optional[Tensor]) -> None:
             if name not in self.stashable_names:
-                raise RuntimeError(f"'{name}' has not been declared as stashable")
+                _stash_not_declared(name, tensor)
             stashed_tensors[name] = tensor
 
         def handle_pop(name: str) -> Optional[Tensor]:
             if name not in self.poppable_names:
-                raise RuntimeError(f"'{name}' has not been declared as poppable")
+                _pop_not_declared(name)
             return poppable_tensors.pop(name)
 
         output = self.dispatch(input, handle_stash, handle_pop)
 
-        # All declared skips must be stashed or popped.
-        not_stashed = self.stashable_names - stashed_tensors.keys()
-        if not_stashed:
+        # All declared skips must be stashed or popped. Only declared names can
+        # be stashed, so the counts match unless some of them are missing.
+        if len(stashed_tensors) != len(self.stashable_names):
+            not_stashed = self.stashable_names - stashed_tensors.keys()
             comma_names = ', '.join("'%s'" % n for n in not_stashed)
             raise RuntimeError(f'{comma_names} must be stashed but have not')
 
@@ -200,15 +225,42 @@ class Skippable(nn.Module):
             raise RuntimeError(f'{comma_names} must be popped but have not')
 
         # Save stashed skip tensors.
-        batch = Batch(output)
-        for ns, name in self.stashable():
-            tensor = stashed_tensors[name]
-            skip_tracker.save(batch, ns, name, tensor)
-        output = batch.tensor_or_tensors
+        if self.stashable_names:
+            batch = Batch(output)
+            for ns, name in self.stashable():
+                tensor = stashed_tensors[name]
+                skip_tracker.save(batch, ns, name, tensor)
+            output = batch.tensor_or_tensors
+
+        return output
+
+    def _forward_without_skips(self, input: TensorOrTensors) -> TensorOrTensors:
+        """Performs the forward propagation of a module without any declared
+        skip names. It replaces :meth:`forward` in such subclasses since there
+        is no skip tensor to be handled by portals.
+
+        Raises:
+            RuntimeError:
+                illegal 'stash' or 'pop' is found.
+
+        """
+        output = self.module(input)
+
+        if isinstance(output, Generator):
+            # Every command is illegal without declared skip names.
+            output = self._drive(output, _stash_not_declared, _pop_not_declared)
 
         return output
 
 
+def _stash_not_declared(name: str, tensor: Optional[Tensor]) -> None:
+    raise RuntimeError(f"'{name}' has not been declared as stashable")
+
+
+def _pop_not_declared(name: str) -> Optional[Tensor]:
+    raise RuntimeError(f"'{name}' has not been declared as poppable")
+
+
 # TODO(sublee): Move to above of Skippable class for better read flow.
 def skippable(stash: Iterable[str] = (),
               pop: Iterable[str] = (),
@@ -281,9 +333,16 @@ def skippable(stash: Iterable[str] = (),
     def extend_skippable(module_cls: Type[SkippableModule]) -> Type[Skippable]:
         name = module_cls.__name__
         bases = (Skippable,)
-        attrs = {'module_cls': module_cls,
-                 'stashable_names': stashable_names,
-                 'poppable_names': poppable_names}
+        attrs: Dict[str, Any] = {'module_cls': module_cls,
+                                 'stashable_names': stashable_names,
+                                 'poppable_names': poppable_names}
+
+        # Skippable modules without any declared skip tensor only have to call
+        # the underlying module. Such modules are called once per micro-batch,
+        # so their forward is specialized when the class is defined.
+        if not stashable_names and not poppable_names:
+            attrs['forward'] = Skippable._forward_without_skips
+
         return type(name, bases, attrs)
 
     return extend_skippable
@@ -366,8 +425,9 @@ def verify_skippables(module: nn.Sequential) -> None:
             one or more pairs of `stash` and `pop` are not matched.
 
     """
-    stashed: Set[Tuple[Namespace, str]] = set()
-    popped: Set[Tuple[Namespace, str]] = set()
+    # Skip names grouped by namespace.
+    stashed: Dict[Namespace, Set[str]] = {}
+    popped: Dict[Namespace, Set[str]] = {}
     msgs: List[str] = []
 
     for layer_name, layer in module.named_children():
@@ -382,34 +442,39 @@ def verify_skippables(module: nn.Sequential) -> None:
             if name in layer.poppable_names:
                 continue
 
-            if (ns, name) in stashed:
+            stashed_names = stashed.setdefault(ns, set())
+
+            if name in stashed_names:
                 msg = (f"'{layer_name}' redeclared '{name}' as stashable "
                        'but not isolated by namespace')
                 msgs.append(msg)
                 continue
 
-            stashed.add((ns, name))
+            stashed_names.add(name)
 
         for ns, name in layer.poppable():
             if name in layer.stashable_names:
                 continue
 
-            if (ns, name) in popped:
+            popped_names = popped.setdefault(ns, set())
+
+            if name in popped_names:
                 msg = (f"'{layer_name}' redeclared '{name}' as poppable "
                        'but not isolated by namespace')
                 msgs.append(msg)
                 continue
 
-            if (ns, name) not in stashed:
+            if name not in stashed.get(ns, set()):
                 msg = f"'{layer_name}' declared '{name}' as poppable but it was not stashed"
                 msgs.append(msg)
                 continue
 
-            popped.add((ns, name))
+            popped_names.add(name)
 
-    for (_, name) in stashed - popped:
-        msg = f"no module declared '{name}' as poppable but stashed"
-        msgs.append(msg)
+    for ns, stashed_names in stashed.items():
+        for name in stashed_names - popped.get(ns, set()):
+            msg = f"no module declared '{name}' as poppable but stashed"
+            msgs.append(msg)
 
     if msgs:
         raise TypeError('one or more pairs of stash and pop do not match:\n\n%s'